@@ -0,0 +1,132 @@
+"""Export the mapped cohort as a sparse feature matrix."""
+
+from collections.abc import Iterable
+
+import numpy as np
+import scipy.sparse as sp
+
+from load_data import Encounter
+from map_groupcode import MapTable
+
+
+class FeatureMatrix:
+    """CSR matrix of groupcode counts with row and column vocabularies.
+
+    Row ``i`` belongs to ``patientids[i]`` (and ``months[i]`` when built per
+    patient-month). Column ``j`` belongs to ``groupcodes[j]``.
+    """
+
+    def __init__(
+        self,
+        matrix: sp.csr_matrix,
+        patientids: list[str],
+        groupcodes: list[str],
+        months: list[str] | None = None,
+    ) -> None:
+        """Initialize a FeatureMatrix instance."""
+        if matrix.shape != (len(patientids), len(groupcodes)):
+            raise ValueError(
+                f"Matrix shape {matrix.shape} does not match vocabularies "
+                f"({len(patientids)}, {len(groupcodes)})."
+            )
+        if months is not None and len(months) != len(patientids):
+            raise ValueError("months must have one entry per row.")
+        self.matrix = matrix
+        self.patientids = patientids
+        self.groupcodes = groupcodes
+        self.months = months
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return len(self.patientids)
+
+    def save_npz(self, path: str) -> None:
+        """Save the matrix and its vocabularies to a ``.npz`` file."""
+        arrays = {
+            "data": self.matrix.data,
+            "indices": self.matrix.indices,
+            "indptr": self.matrix.indptr,
+            "shape": np.array(self.matrix.shape),
+            "patientids": np.array(self.patientids, dtype=str),
+            "groupcodes": np.array(self.groupcodes, dtype=str),
+        }
+        if self.months is not None:
+            arrays["months"] = np.array(self.months, dtype=str)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load_npz(cls, path: str) -> "FeatureMatrix":
+        """Load a matrix saved with ``save_npz``."""
+        with np.load(path, allow_pickle=False) as npz:
+            matrix = sp.csr_matrix(
+                (npz["data"], npz["indices"], npz["indptr"]),
+                shape=tuple(npz["shape"]),
+            )
+            months = npz["months"].tolist() if "months" in npz else None
+            return cls(
+                matrix,
+                npz["patientids"].tolist(),
+                npz["groupcodes"].tolist(),
+                months,
+            )
+
+
+def build_feature_matrix(
+    encounters: Iterable[Encounter],
+    maptable: MapTable,
+    by: str = "patient",
+    groupcodes: list[str] | None = None,
+) -> FeatureMatrix:
+    """Count groupcodes per patient or patient-month into a CSR matrix.
+
+    Encounters are mapped and counted in one pass, without building the long
+    co-occurrence DataFrame. Columns default to every groupcode in the
+    mapping table, sorted, so matrices built from different extracts line
+    up. Groupcodes missing from ``groupcodes`` are dropped.
+    """
+    if by not in ("patient", "patient_month"):
+        raise ValueError("by must be 'patient' or 'patient_month'.")
+    if groupcodes is None:
+        # Blank groupcodes are read by pandas as NaN; they map to nothing.
+        groupcodes = sorted(
+            {g for g in maptable.mapping.values() if isinstance(g, str) and g}
+        )
+    column_index = {code: j for j, code in enumerate(groupcodes)}
+
+    # Resolve localcode straight to a column to skip the groupcode lookup.
+    local_to_column = {
+        local: column_index[group]
+        for local, group in maptable.mapping.items()
+        if group in column_index
+    }
+
+    counts: dict[tuple[str, str], dict[int, int]] = {}
+    for enc in encounters:
+        col = local_to_column.get(enc.localcode)
+        if col is None:
+            continue
+        month = enc.encounterdate.strftime("%Y-%m") if by != "patient" else ""
+        row = counts.setdefault((enc.patientid, month), {})
+        row[col] = row.get(col, 0) + 1
+
+    row_keys = sorted(counts)
+    indptr = np.zeros(len(row_keys) + 1, dtype=np.int64)
+    indices: list[int] = []
+    data: list[int] = []
+    for i, key in enumerate(row_keys):
+        row = counts[key]
+        for col in sorted(row):
+            indices.append(col)
+            data.append(row[col])
+        indptr[i + 1] = len(indices)
+
+    matrix = sp.csr_matrix(
+        (
+            np.array(data, dtype=np.int64),
+            np.array(indices, dtype=np.int32),
+            indptr,
+        ),
+        shape=(len(row_keys), len(groupcodes)),
+    )
+    months = [m for _, m in row_keys] if by == "patient_month" else None
+    return FeatureMatrix(matrix, [p for p, _ in row_keys], groupcodes, months)
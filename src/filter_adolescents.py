@@ -1,9 +1,9 @@
 """Filter a specific cohort."""
 
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator, Sequence
 from datetime import date
 
-from src.load_data import Encounter, Patient
+from src.load_data import Encounter, Patient, Quarantine, RowValidationError
 
 
 class FilteredEncounterData:
@@ -34,38 +34,162 @@ class FilteredEncounterData:
         return iter(self.encounters)
 
 
-def filter_adolescents(
-    encounters: list[Encounter], patients: list[Patient]
-) -> FilteredEncounterData:
-    """Filter encounters to include specific encounter."""
+def _calculate_age(dob: date, encounter_date: date) -> int:
+    """Calculate age at encounter time."""
+    return (
+        encounter_date.year
+        - dob.year
+        - ((encounter_date.month, encounter_date.day) < (dob.month, dob.day))
+    )
 
-    def calculate_age(dob: date, encounter_date: date) -> int:
-        """Calculate age at encounter time."""
-        return (
-            encounter_date.year
-            - dob.year
-            - (
-                (encounter_date.month, encounter_date.day)
-                < (dob.month, dob.day)
-            )
-        )
 
-    patient_lookup = {p.patientid: p.dob for p in patients}
-    filtered = []
+def _is_sorted_by_patientid(items: Sequence[Encounter | Patient]) -> bool:
+    """Return whether items are in non-decreasing patientid order."""
+    return all(
+        items[i - 1].patientid <= items[i].patientid
+        for i in range(1, len(items))
+    )
+
 
+def _hash_join(
+    encounters: Iterable[Encounter], patients: Iterable[Patient]
+) -> Iterator[tuple[Encounter, date | None]]:
+    """Pair each encounter with its patient's dob via a lookup dict.
+
+    When a patientid is repeated, the last row wins.
+    """
+    patient_lookup = {p.patientid: p.dob for p in patients}
     for e in encounters:
-        dob = patient_lookup.get(e.patientid)
-        if dob is None:
-            raise ValueError(f"Encounter patientid '{e.patientid}' not found.")
+        yield e, patient_lookup.get(e.patientid)
+
+
+def _sorted_patients(patients: Iterable[Patient]) -> Iterator[Patient]:
+    """Check patientid order and keep the last row of each patientid.
+
+    Keeping the last row matches the lookup dict of ``_hash_join``.
+    """
+    previous = None
+    for p in patients:
+        if previous is not None:
+            if p.patientid < previous.patientid:
+                raise ValueError(
+                    "Patients are not sorted by patientid: "
+                    f"'{p.patientid}' follows '{previous.patientid}'."
+                )
+            if p.patientid != previous.patientid:
+                yield previous
+        previous = p
+    if previous is not None:
+        yield previous
+
+
+def _merge_join(
+    encounters: Iterable[Encounter], patients: Iterator[Patient]
+) -> Iterator[tuple[Encounter, date | None]]:
+    """Pair each encounter with its patient's dob in constant memory.
+
+    Both inputs must be sorted by patientid; they are walked in lockstep.
+    ``patients`` should come from ``_sorted_patients``.
+    """
+    current = next(patients, None)
+    last_pid = None
 
-        if e.encounterdate < dob:
+    for e in encounters:
+        if last_pid is not None and e.patientid < last_pid:
             raise ValueError(
-                f"Encounter date {e.encounterdate} is before birthdate {dob} "
-                f"for patient {e.patientid}."
+                f"Encounters are not sorted by patientid: '{e.patientid}' "
+                f"follows '{last_pid}'."
             )
-
-        age = calculate_age(dob, e.encounterdate)
+        last_pid = e.patientid
+
+        while current is not None and current.patientid < e.patientid:
+            current = next(patients, None)
+
+        if current is None or current.patientid != e.patientid:
+            yield e, None
+        else:
+            yield e, current.dob
+
+
+def iter_adolescents(
+    encounters: Iterable[Encounter],
+    patients: Iterable[Patient],
+    presorted: bool | None = None,
+    quarantine: Quarantine | None = None,
+) -> Iterator[Encounter]:
+    """Stream encounters of patients aged 10-17 at encounter time.
+
+    With ``presorted=True`` both inputs are joined by a streaming sort-merge
+    on patientid, which needs no patient lookup table. With ``None`` the
+    sort-merge is chosen when both inputs are sequences already sorted by
+    patientid; otherwise patients are loaded into a lookup dict. Declaring
+    unsorted input as sorted raises ValueError; the rest of the patients
+    are read to check their order once encounters run out, or before an
+    unknown patientid is reported. In both joins the last row of a
+    repeated patientid wins.
+
+    Encounters with an unknown patient or dated before birth raise
+    ValueError, or are sent to ``quarantine`` if given.
+    """
+    if presorted is None:
+        presorted = (
+            isinstance(encounters, Sequence)
+            and isinstance(patients, Sequence)
+            and _is_sorted_by_patientid(encounters)
+            and _is_sorted_by_patientid(patients)
+        )
+    if presorted:
+        patient_iter = _sorted_patients(patients)
+        pairs = _merge_join(encounters, patient_iter)
+    else:
+        patient_iter = iter(())
+        pairs = _hash_join(encounters, patients)
+
+    for e, dob in pairs:
+        try:
+            if dob is None:
+                if quarantine is None:
+                    # Out-of-order patients also look like unknown ones.
+                    for _ in patient_iter:
+                        pass
+                raise RowValidationError(
+                    "UNKNOWN_PATIENT",
+                    f"Encounter patientid '{e.patientid}' not found.",
+                )
+            if e.encounterdate < dob:
+                raise RowValidationError(
+                    "ENCOUNTER_BEFORE_DOB",
+                    f"Encounter date {e.encounterdate} is before birthdate "
+                    f"{dob} for patient {e.patientid}.",
+                )
+        except RowValidationError as error:
+            if quarantine is None:
+                raise
+            record = [
+                e.patientid,
+                e.encounterid,
+                e.encounterdate.isoformat(),
+                e.localcode,
+            ]
+            quarantine.reject("filter_adolescents", None, error, record)
+            continue
+
+        age = _calculate_age(dob, e.encounterdate)
         if 10 <= age <= 17:
-            filtered.append(e)
+            yield e
+
+    # Check the order of patients left after the last encounter.
+    for _ in patient_iter:
+        pass
 
-    return FilteredEncounterData(filtered)
+
+def filter_adolescents(
+    encounters: Iterable[Encounter],
+    patients: Iterable[Patient],
+    presorted: bool | None = None,
+    quarantine: Quarantine | None = None,
+) -> FilteredEncounterData:
+    """Filter encounters to include specific encounter."""
+    return FilteredEncounterData(
+        list(iter_adolescents(encounters, patients, presorted, quarantine))
+    )
@@ -1,7 +1,20 @@
 """Load Data."""
 
+import contextlib
 import csv
+import hashlib
+import io
+import os
+from collections.abc import Callable, Iterable, Iterator
 from datetime import date, datetime
+from typing import Any, TypeVar
+
+try:
+    from sketches import BloomFilter
+except ModuleNotFoundError:  # imported as src.load_data, as main.py does
+    from src.sketches import BloomFilter
+
+T = TypeVar("T")
 
 
 class Patient:
@@ -64,88 +77,390 @@ class Encounter:
         )
 
 
-def load_patients(path: str) -> list[Patient]:
-    """Load patients from a CSV file."""
-    patients = []
-    with open(path, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
+class RowValidationError(ValueError):
+    """A rejected input row, tagged with a reason code."""
+
+    def __init__(self, reason: str, message: str) -> None:
+        """Initialize with a reason code such as ``INVALID_DATE``."""
+        super().__init__(message)
+        self.reason = reason
+
+
+class Quarantine:
+    """Collect rejected rows in a CSV file instead of failing fast.
+
+    Each rejected row is written with its source, line number, reason code
+    and message. With ``max_errors``, a ValueError is raised once more rows
+    than that are rejected. A ``path`` of None only counts rejections.
+    """
 
-        if not rows:
+    COLUMNS = ["source", "line", "reason", "message", "record"]
+
+    def __init__(self, path: str | None, max_errors: int | None = None):
+        """Initialize a Quarantine instance."""
+        self.path = path
+        self.max_errors = max_errors
+        self.count = 0
+        self.reasons: dict[str, int] = {}
+        self._file = (
+            open(path, "w", encoding="utf-8", newline="")  # noqa: SIM115
+            if path is not None
+            else None
+        )
+        self._writer = csv.writer(self._file) if self._file else None
+        if self._writer is not None:
+            self._writer.writerow(self.COLUMNS)
+
+    def __enter__(self) -> "Quarantine":
+        """Return the quarantine for use in a with-block."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the quarantine file."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the quarantine file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def reject(
+        self,
+        source: str,
+        line: int | None,
+        error: RowValidationError,
+        record: list[str],
+    ) -> None:
+        """Record a rejected row and enforce the error budget."""
+        self.count += 1
+        self.reasons[error.reason] = self.reasons.get(error.reason, 0) + 1
+        if self._writer is not None:
+            self._writer.writerow(
+                [
+                    source,
+                    "" if line is None else line,
+                    error.reason,
+                    str(error),
+                    _encode_record(record),
+                ]
+            )
+        if self.max_errors is not None and self.count > self.max_errors:
             raise ValueError(
-                "Input file is empty or contains no patient records."
+                f"Error budget exceeded: {self.count} rejected rows "
+                f"(max_errors={self.max_errors})."
             )
 
-        for row in rows:
-            pid = row["patientid"]
 
-            # Empty patientid
-            if not pid.strip():
-                raise ValueError("Empty patientid found in data row")
+def _encode_record(fields: list[str]) -> str:
+    """Encode fields as one CSV line, so ``csv.reader`` can split them back."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(fields)
+    return buffer.getvalue()
 
-            dob_str = row["dob"]
 
-            # Invalid Date Format
-            try:
-                dob = datetime.strptime(dob_str, "%Y-%m-%d").date()
-            except ValueError as e:
-                raise ValueError(
-                    f"Invalid date format for patient {pid}: '{dob_str}' "
-                ) from e
-            patient = Patient(patientid=pid, dob=dob)
-            patients.append(patient)
-    return patients
-
-
-def load_encounters(path: str) -> list[Encounter]:
-    """Load encounter data from a CSV file."""
-    encounters = []
+def _row_values(row: dict[str | None, Any]) -> list[str]:
+    """Return the original fields of a csv.DictReader row.
+
+    Missing trailing fields are left out and overflow fields, which
+    DictReader stores as a list under the ``None`` key, are kept.
+    """
+    fields = [v for k, v in row.items() if k is not None and v is not None]
+    return fields + list(row.get(None) or [])
+
+
+def _parse_patient(row: dict[str, str]) -> Patient:
+    """Validate one patient row."""
+    pid = row["patientid"] or ""
+
+    # Empty patientid
+    if not pid.strip():
+        raise RowValidationError(
+            "EMPTY_PATIENTID", "Empty patientid found in data row"
+        )
+
+    dob_str = row["dob"] or ""
+
+    # Invalid Date Format
+    try:
+        dob = datetime.strptime(dob_str, "%Y-%m-%d").date()
+    except ValueError as e:
+        raise RowValidationError(
+            "INVALID_DOB",
+            f"Invalid date format for patient {pid}: '{dob_str}' ",
+        ) from e
+    return Patient(patientid=pid, dob=dob)
+
+
+def _parse_encounter(row: dict[str, str]) -> Encounter:
+    """Validate one encounter row."""
+    pid = row["patientid"] or ""
+    eid = row["encounterid"] or ""
+    edate_str = row["encounterdate"] or ""
+    code = row["localcode"] or ""
+
+    # Check for empty fields
+    if not pid.strip():
+        raise RowValidationError(
+            "EMPTY_PATIENTID", "Empty patientid found in data row."
+        )
+    if not eid.strip():
+        raise RowValidationError(
+            "EMPTY_ENCOUNTERID", f"Empty encounterid found for patient {pid}."
+        )
+    if not edate_str.strip():
+        raise RowValidationError(
+            "EMPTY_ENCOUNTERDATE",
+            f"Empty encounterdate for patient {pid}, encounter {eid}.",
+        )
+    if not code.strip():
+        raise RowValidationError(
+            "EMPTY_LOCALCODE",
+            f"Empty localcode for patient {pid}, encounter {eid}.",
+        )
+
+    # Parse date
+    try:
+        edate = datetime.strptime(edate_str, "%Y-%m-%d").date()
+    except ValueError as e:
+        raise RowValidationError(
+            "INVALID_ENCOUNTERDATE",
+            f"Invalid date format for patient {pid}, encounter {eid}: "
+            f"'{edate_str}' (expected YYYY-MM-DD)",
+        ) from e
+
+    return Encounter(
+        patientid=pid,
+        encounterid=eid,
+        encounterdate=edate,
+        localcode=code,
+    )
+
+
+def _iter_rows(
+    path: str,
+    parse: Callable[[dict[str, str]], T],
+    kind: str,
+    quarantine: Quarantine | None,
+) -> Iterator[T]:
+    """Stream parsed rows, quarantining invalid ones if asked to."""
     with open(path, encoding="utf-8") as f:
         reader = csv.DictReader(f)
-        rows = list(reader)
+        empty = True
 
-        if not rows:
+        for row in reader:
+            empty = False
+            try:
+                item = parse(row)
+            except RowValidationError as e:
+                if quarantine is None:
+                    raise
+                quarantine.reject(path, reader.line_num, e, _row_values(row))
+                continue
+            yield item
+
+        if empty:
             raise ValueError(
-                "Input file is empty or contains no encounter records."
+                f"Input file is empty or contains no {kind} records."
             )
 
-        for row in rows:
-            pid = row["patientid"]
-            eid = row["encounterid"]
-            edate_str = row["encounterdate"]
-            code = row["localcode"]
-
-            # Check for empty fields
-            if not pid.strip():
-                raise ValueError("Empty patientid found in data row.")
-            if not eid.strip():
-                raise ValueError(f"Empty encounterid found for patient {pid}.")
-            if not edate_str.strip():
-                raise ValueError(
-                    f"Empty encounterdate for patient {pid}, encounter {eid}."
-                )
-            if not code.strip():
-                raise ValueError(
-                    f"Empty localcode for patient {pid}, encounter {eid}."
-                )
-
-            # Parse date
-            try:
-                edate = datetime.strptime(edate_str, "%Y-%m-%d").date()
-            except ValueError as e:
-                raise ValueError(
-                    f"Invalid date format for patient {pid}, encounter {eid}: "
-                    f"'{edate_str}' (expected YYYY-MM-DD)"
-                ) from e
-
-            encounter = Encounter(
-                patientid=pid,
-                encounterid=eid,
-                encounterdate=edate,
-                localcode=code,
+
+def iter_patients(
+    path: str, quarantine: Quarantine | None = None
+) -> Iterator[Patient]:
+    """Stream patients from a CSV file one row at a time.
+
+    Invalid rows raise ValueError, or are sent to ``quarantine`` if given.
+    """
+    return _iter_rows(path, _parse_patient, "patient", quarantine)
+
+
+def load_patients(
+    path: str, quarantine: Quarantine | None = None
+) -> list[Patient]:
+    """Load patients from a CSV file."""
+    return list(iter_patients(path, quarantine))
+
+
+def iter_encounters(
+    path: str, quarantine: Quarantine | None = None
+) -> Iterator[Encounter]:
+    """Stream encounter data from a CSV file one row at a time.
+
+    Invalid rows raise ValueError, or are sent to ``quarantine`` if given.
+    """
+    return _iter_rows(path, _parse_encounter, "encounter", quarantine)
+
+
+def _digest(key: str) -> bytes:
+    """Return the fixed-size digest stored for a dedup key."""
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+def _file_stamp(path: str) -> tuple[int, int] | None:
+    """Return the size and mtime of a file, or None if it is missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class EncounterDeduplicator:
+    """Drop repeated encounters, by encounterid or by whole row.
+
+    Seen keys are stored as 16-byte blake2b digests, so memory per key is
+    fixed and a collision between distinct encounters is negligible. When
+    ``expected_items`` reaches ``bloom_threshold``, only keys that a Bloom
+    filter flags as possible repeats are stored, and ``prescan`` must run
+    on each file before ``filter``. A reused deduplicator also drops
+    repeats across files: when a new file brings new candidates, the key
+    columns of the files loaded before it are read again to confirm them,
+    so those files must stay unchanged on disk. ``removed`` counts the
+    dropped encounters.
+    """
+
+    def __init__(
+        self,
+        key: str = "encounterid",
+        expected_items: int | None = None,
+        bloom_threshold: int = 10_000_000,
+        false_positive_rate: float = 0.001,
+    ) -> None:
+        """Initialize an EncounterDeduplicator instance."""
+        if key not in ("encounterid", "row"):
+            raise ValueError("Dedup key must be 'encounterid' or 'row'.")
+        self.key = key
+        self.removed = 0
+        self.use_bloom = (
+            expected_items is not None and expected_items >= bloom_threshold
+        )
+        self._bloom = (
+            BloomFilter(expected_items, false_positive_rate)
+            if expected_items is not None and self.use_bloom
+            else None
+        )
+        self._candidates: set[bytes] = set()
+        self._seen: set[bytes] = set()
+        self._stamps: dict[str, tuple[int, int] | None] = {}
+        self._prescanned = False
+
+    def _key(self, e: Encounter) -> str:
+        """Return the text that identifies a duplicate."""
+        if self.key == "encounterid":
+            return e.encounterid
+        return "\x1f".join(
+            (
+                e.patientid,
+                e.encounterid,
+                e.encounterdate.isoformat(),
+                e.localcode,
+            )
+        )
+
+    def _read_keys(self, path: str) -> Iterator[str]:
+        """Yield the key of each row, reading only the key columns."""
+        with open(path, encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            width = len(header)
+            if self.key == "encounterid":
+                eid_col = header.index("encounterid")
+                for fields in reader:
+                    # Short rows are rejected when the file is parsed.
+                    if len(fields) >= width:
+                        yield fields[eid_col]
+                return
+
+            columns = [
+                header.index(c)
+                for c in ("patientid", "encounterid", "encounterdate")
+            ]
+            code = header.index("localcode")
+            for fields in reader:
+                if len(fields) < width:
+                    continue
+                pid, eid, edate = (fields[c] for c in columns)
+                if len(edate) != 10:
+                    # Match Encounter.encounterdate.isoformat() for dates
+                    # written without zero padding.
+                    with contextlib.suppress(ValueError):
+                        edate = (
+                            datetime.strptime(edate, "%Y-%m-%d")
+                            .date()
+                            .isoformat()
+                        )
+                yield "\x1f".join((pid, eid, edate, fields[code]))
+
+    def prescan(self, path: str) -> None:
+        """Collect keys that may repeat; run before ``filter`` with Bloom."""
+        if self._bloom is None:
+            return
+        new_candidates = set()
+        for key in self._read_keys(path):
+            if self._bloom.add(key):
+                digest = _digest(key)
+                if digest not in self._candidates:
+                    new_candidates.add(digest)
+        self._candidates |= new_candidates
+
+        # A new candidate may repeat a key from an earlier file, which was
+        # passed through unrecorded. Confirm it from that file's key columns.
+        if new_candidates:
+            for earlier, stamp in self._stamps.items():
+                if _file_stamp(earlier) != stamp:
+                    raise ValueError(
+                        f"{earlier} is missing or has changed since it was "
+                        "deduplicated."
+                    )
+                for key in self._read_keys(earlier):
+                    digest = _digest(key)
+                    if digest in new_candidates:
+                        self._seen.add(digest)
+        self._stamps[path] = _file_stamp(path)
+        self._prescanned = True
+
+    def filter(self, encounters: Iterable[Encounter]) -> Iterator[Encounter]:
+        """Yield the first occurrence of each encounter."""
+        if self._bloom is not None and not self._prescanned:
+            raise ValueError(
+                "Call prescan() on the file before filter() in Bloom mode."
             )
-            encounters.append(encounter)
-    return encounters
+        self._prescanned = False
+        return self._filter(encounters)
+
+    def _filter(self, encounters: Iterable[Encounter]) -> Iterator[Encounter]:
+        """Drop encounters whose key digest was seen before."""
+        for e in encounters:
+            digest = _digest(self._key(e))
+            # Keys the prefilter never saw twice are unique.
+            if self._bloom is not None and digest not in self._candidates:
+                yield e
+                continue
+            if digest in self._seen:
+                self.removed += 1
+                continue
+            self._seen.add(digest)
+            yield e
+
+
+def load_encounters(
+    path: str,
+    dedup: EncounterDeduplicator | None = None,
+    quarantine: Quarantine | None = None,
+) -> list[Encounter]:
+    """Load encounter data from a CSV file.
+
+    With ``dedup``, repeated encounters are dropped and counted in
+    ``dedup.removed``. With ``quarantine``, invalid rows are recorded there
+    and skipped.
+    """
+    if dedup is None:
+        return list(iter_encounters(path, quarantine))
+    if dedup.use_bloom:
+        dedup.prescan(path)
+    return list(dedup.filter(iter_encounters(path, quarantine)))
 
 
 if __name__ == "__main__":
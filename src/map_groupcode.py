@@ -1,27 +1,52 @@
 """Map Data."""
 
+from collections import Counter
+from collections.abc import Iterable
+
 import pandas as pd
 
 from load_data import Encounter
+from sketches import HeavyHitters, HyperLogLog
 
 
 class MapTable:
     """Mapping from localcode to groupcode."""
 
-    def __init__(self, mapping: dict[str, str]):
-        """Initialize maptable."""
+    def __init__(
+        self,
+        mapping: dict[str, str],
+        versions: dict[str, dict[str, str]] | None = None,
+    ):
+        """Initialize maptable.
+
+        ``versions`` optionally holds named revisions of the mapping to be
+        compared with ``cooccurrence_by_version``.
+        """
         self.mapping = mapping
+        self.versions = versions if versions is not None else {}
 
-    @classmethod
-    def from_csv(cls, path: str) -> "MapTable":
-        """Load map table."""
+    @staticmethod
+    def _read_mapping(path: str) -> dict[str, str]:
+        """Read a localcode to groupcode mapping from a CSV file."""
         df = pd.read_csv(path)
         if "localcode" not in df.columns or "groupcode" not in df.columns:
             raise ValueError(
                 "Mapping file must contain 'localcode' and 'groupcode'"
             )
-        mapping = dict(zip(df["localcode"], df["groupcode"]))
-        return cls(mapping)
+        return dict(zip(df["localcode"], df["groupcode"], strict=True))
+
+    @classmethod
+    def from_csv(cls, path: str) -> "MapTable":
+        """Load map table."""
+        return cls(cls._read_mapping(path))
+
+    @classmethod
+    def from_csv_versions(cls, paths: dict[str, str]) -> "MapTable":
+        """Load named mapping versions; the first one is the default."""
+        if not paths:
+            raise ValueError("At least one mapping version is required.")
+        versions = {name: cls._read_mapping(p) for name, p in paths.items()}
+        return cls(next(iter(versions.values())), versions)
 
     def map_encounters(
         self, encounters: list[Encounter]
@@ -34,6 +59,74 @@ class MapTable:
                 results.append((enc, groupcode))
         return results
 
+    def cooccurrence_by_version(
+        self, encounters: Iterable[Encounter]
+    ) -> dict[str, pd.DataFrame]:
+        """Return one co-occurrence table per mapping version.
+
+        Encounters are scanned once; each localcode is resolved against all
+        versions at once through a shared index of groupcode tuples.
+        """
+        if not self.versions:
+            raise ValueError("MapTable has no mapping versions.")
+        names = list(self.versions)
+
+        def resolve(code: str, name: str) -> str | None:
+            # Blank groupcodes are read by pandas as NaN; they map to nothing.
+            groupcode = self.versions[name].get(code)
+            return groupcode if isinstance(groupcode, str) else None
+
+        code_index = {
+            code: tuple(resolve(code, name) for name in names)
+            for code in set().union(*self.versions.values())
+        }
+
+        counters: list[Counter[tuple[str, str, str]]] = [
+            Counter() for _ in names
+        ]
+        for enc in encounters:
+            groupcodes = code_index.get(enc.localcode)
+            if groupcodes is None:
+                continue
+            month = enc.encounterdate.strftime("%Y-%m")
+            for counter, groupcode in zip(counters, groupcodes, strict=True):
+                if groupcode:
+                    counter[(month, enc.patientid, groupcode)] += 1
+
+        return {
+            name: _counts_to_frame(counter)
+            for name, counter in zip(names, counters, strict=True)
+        }
+
+
+def _counts_to_frame(counter: Counter[tuple[str, str, str]]) -> pd.DataFrame:
+    """Build a co-occurrence table from counts keyed by the table keys."""
+    rows = [(*key, count) for key, count in sorted(counter.items())]
+    return pd.DataFrame(
+        rows, columns=["month", "patientid", "groupcode", "count"]
+    ).astype({"count": "int64"})
+
+
+def diff_cooccurrence_tables(tables: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Return the rows whose count differs between co-occurrence tables.
+
+    The result has the key columns plus one count column per table name,
+    with 0 where a table has no row for that key.
+    """
+    if not tables:
+        raise ValueError("At least one co-occurrence table is required.")
+    keys = ["month", "patientid", "groupcode"]
+    wide = pd.concat(
+        [
+            df.set_index(keys)["count"].rename(name)
+            for name, df in tables.items()
+        ],
+        axis=1,
+    )
+    wide = wide.fillna(0).astype("int64").sort_index()
+    changed = wide.nunique(axis=1) > 1
+    return wide[changed].reset_index()
+
 
 def generate_cooccurrence_table(
     mapped_encounters: list[tuple[Encounter, str]],
@@ -53,5 +146,117 @@ def generate_cooccurrence_table(
     return cooccur_df
 
 
+class GroupcodeSketch:
+    """Approximate monthly groupcode statistics in fixed memory per key.
+
+    Keeps a HyperLogLog of distinct patients for each ``(month, groupcode)``
+    and a Count-Min heavy-hitter tracker of encounter volume. Sketches built
+    with the same parameters on different shards can be merged.
+    """
+
+    def __init__(
+        self,
+        precision: int = 10,
+        top_k: int = 20,
+        width: int = 2048,
+        depth: int = 4,
+    ) -> None:
+        """Initialize an empty sketch."""
+        self.precision = precision
+        self.distinct: dict[tuple[str, str], HyperLogLog] = {}
+        self.volume = HeavyHitters(top_k, width, depth)
+
+    def _params(self) -> tuple[int, int, int, int]:
+        """Return ``(precision, top_k, width, depth)``."""
+        return (
+            self.precision,
+            self.volume.k,
+            self.volume.sketch.width,
+            self.volume.sketch.depth,
+        )
+
+    @staticmethod
+    def _key(month: str, groupcode: str) -> str:
+        """Return the Count-Min key for a ``(month, groupcode)`` pair."""
+        return f"{month}|{groupcode}"
+
+    def add(self, month: str, patientid: str, groupcode: str) -> None:
+        """Record one encounter."""
+        hll = self.distinct.get((month, groupcode))
+        if hll is None:
+            hll = self.distinct[(month, groupcode)] = HyperLogLog(
+                self.precision
+            )
+        hll.add(patientid)
+        self.volume.add(self._key(month, groupcode))
+
+    def distinct_patients(self, month: str, groupcode: str) -> int:
+        """Return the estimated number of distinct patients."""
+        hll = self.distinct.get((month, groupcode))
+        return 0 if hll is None else hll.count()
+
+    def estimate_count(self, month: str, groupcode: str) -> int:
+        """Return the estimated number of encounters."""
+        if (month, groupcode) not in self.distinct:
+            return 0
+        return self.volume.sketch.estimate(self._key(month, groupcode))
+
+    def top_groupcodes(
+        self, n: int | None = None
+    ) -> list[tuple[str, str, int]]:
+        """Return the heaviest ``(month, groupcode, count)`` entries."""
+        results = []
+        for key, count in self.volume.top(n):
+            month, groupcode = key.split("|", 1)
+            results.append((month, groupcode, count))
+        return results
+
+    def merge(self, other: "GroupcodeSketch") -> "GroupcodeSketch":
+        """Return a new sketch covering the encounters of both sketches."""
+        if self._params() != other._params():
+            raise ValueError(
+                "Cannot merge sketches with different parameters: "
+                f"{self._params()} vs {other._params()} "
+                "(precision, top_k, width, depth)."
+            )
+        merged = GroupcodeSketch(*self._params())
+        merged.volume = self.volume.merge(other.volume)
+        empty = HyperLogLog(self.precision)
+        for key in self.distinct.keys() | other.distinct.keys():
+            merged.distinct[key] = self.distinct.get(key, empty).merge(
+                other.distinct.get(key, empty)
+            )
+        return merged
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return estimated distinct patients and counts per key."""
+        records = [
+            (
+                month,
+                groupcode,
+                hll.count(),
+                self.estimate_count(month, groupcode),
+            )
+            for (month, groupcode), hll in sorted(self.distinct.items())
+        ]
+        return pd.DataFrame(
+            records,
+            columns=["month", "groupcode", "distinct_patients", "count"],
+        )
+
+
+def generate_cooccurrence_sketch(
+    mapped_encounters: list[tuple[Encounter, str]],
+    precision: int = 10,
+    top_k: int = 20,
+) -> GroupcodeSketch:
+    """Generate approximate monthly groupcode statistics."""
+    sketch = GroupcodeSketch(precision=precision, top_k=top_k)
+    for enc, groupcode in mapped_encounters:
+        month = enc.encounterdate.strftime("%Y-%m")
+        sketch.add(month, enc.patientid, groupcode)
+    return sketch
+
+
 if __name__ == "__main__":
     pass
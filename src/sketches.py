@@ -0,0 +1,202 @@
+"""Fixed-memory probabilistic sketches."""
+
+import hashlib
+import math
+
+
+def _hash64(value: str, salt: bytes = b"") -> int:
+    """Return a stable 64-bit hash of a string.
+
+    Python's built-in ``hash`` is randomized per process, so sketches built
+    on different shards would not line up. ``blake2b`` is stable everywhere.
+    """
+    digest = hashlib.blake2b(
+        value.encode("utf-8"), digest_size=8, salt=salt
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HyperLogLog:
+    """Approximate distinct counter using ``2 ** precision`` registers."""
+
+    def __init__(self, precision: int = 12) -> None:
+        """Initialize an empty sketch."""
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16.")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        """Add a value to the sketch."""
+        h = _hash64(value)
+        idx = h >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = h & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self) -> int:
+        """Return the estimated number of distinct values."""
+        m = len(self.registers)
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+
+        zeros = self.registers.count(0)
+        if zeros:
+            # Linear counting is more accurate while registers are sparse;
+            # the raw estimate is biased up to roughly 3 * m.
+            linear = m * math.log(m / zeros)
+            if linear <= 3 * m:
+                return round(linear)
+        return round(alpha * m * m / sum(2.0**-r for r in self.registers))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Return a new sketch covering the values of both sketches."""
+        if self.precision != other.precision:
+            raise ValueError(
+                "Cannot merge HyperLogLogs of different precision."
+            )
+        merged = HyperLogLog(self.precision)
+        merged.registers = bytearray(
+            max(a, b)
+            for a, b in zip(self.registers, other.registers, strict=True)
+        )
+        return merged
+
+
+class CountMinSketch:
+    """Approximate frequency counter with ``depth`` rows of ``width`` cells."""
+
+    def __init__(self, width: int = 2048, depth: int = 4) -> None:
+        """Initialize an empty sketch."""
+        if width < 1 or depth < 1:
+            raise ValueError(
+                "CountMinSketch width and depth must be positive."
+            )
+        self.width = width
+        self.depth = depth
+        self.table = [[0] * width for _ in range(depth)]
+
+    def _cells(self, key: str) -> list[int]:
+        """Return the column index of ``key`` in each row."""
+        h1 = _hash64(key)
+        h2 = _hash64(key, salt=b"cms") | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> None:
+        """Add ``count`` occurrences of ``key``."""
+        for row, col in zip(self.table, self._cells(key), strict=True):
+            row[col] += count
+
+    def estimate(self, key: str) -> int:
+        """Return an upper-bound estimate of the count of ``key``."""
+        return min(
+            row[col]
+            for row, col in zip(self.table, self._cells(key), strict=True)
+        )
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        """Return a new sketch holding the summed counts of both sketches."""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError(
+                "Cannot merge CountMinSketches of different dimensions."
+            )
+        merged = CountMinSketch(self.width, self.depth)
+        merged.table = [
+            [a + b for a, b in zip(row_a, row_b, strict=True)]
+            for row_a, row_b in zip(self.table, other.table, strict=True)
+        ]
+        return merged
+
+
+class HeavyHitters:
+    """Track the ``k`` most frequent keys on top of a Count-Min sketch."""
+
+    def __init__(self, k: int = 20, width: int = 2048, depth: int = 4) -> None:
+        """Initialize an empty tracker."""
+        if k < 1:
+            raise ValueError("HeavyHitters k must be positive.")
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates: dict[str, int] = {}
+
+    def add(self, key: str, count: int = 1) -> None:
+        """Add ``count`` occurrences of ``key``."""
+        self.sketch.add(key, count)
+        self._offer(key, self.sketch.estimate(key))
+
+    def _offer(self, key: str, estimate: int) -> None:
+        """Keep ``key`` if it is among the ``k`` largest estimates."""
+        if key in self.candidates or len(self.candidates) < self.k:
+            self.candidates[key] = estimate
+            return
+        smallest = min(self.candidates, key=self.candidates.__getitem__)
+        if estimate > self.candidates[smallest]:
+            del self.candidates[smallest]
+            self.candidates[key] = estimate
+
+    def top(self, n: int | None = None) -> list[tuple[str, int]]:
+        """Return up to ``n`` keys and estimated counts, largest first."""
+        ranked = sorted(
+            self.candidates.items(), key=lambda kv: (-kv[1], kv[0])
+        )
+        return ranked[: self.k if n is None else n]
+
+    def merge(self, other: "HeavyHitters") -> "HeavyHitters":
+        """Return a new tracker covering the keys of both trackers."""
+        merged = HeavyHitters(self.k, self.sketch.width, self.sketch.depth)
+        merged.sketch = self.sketch.merge(other.sketch)
+        for key in set(self.candidates) | set(other.candidates):
+            merged._offer(key, merged.sketch.estimate(key))
+        return merged
+
+
+class BloomFilter:
+    """Set membership filter with no false negatives."""
+
+    def __init__(
+        self, capacity: int, false_positive_rate: float = 0.001
+    ) -> None:
+        """Size the filter for ``capacity`` items at the given error rate."""
+        if capacity < 1:
+            raise ValueError("BloomFilter capacity must be positive.")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(
+                "BloomFilter false_positive_rate must be between 0 and 1."
+            )
+        n_bits = math.ceil(
+            -capacity * math.log(false_positive_rate) / math.log(2) ** 2
+        )
+        self.n_bits = max(8, n_bits)
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+
+    def _positions(self, value: str) -> list[int]:
+        """Return the bit positions of ``value``."""
+        h1 = _hash64(value)
+        h2 = _hash64(value, salt=b"bloom") | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def add(self, value: str) -> bool:
+        """Add ``value``; return whether it was possibly present before."""
+        present = True
+        for pos in self._positions(value):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte] & mask:
+                present = False
+                self.bits[byte] |= mask
+        return present
+
+    def __contains__(self, value: str) -> bool:
+        """Return whether ``value`` is possibly present."""
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(value)
+        )
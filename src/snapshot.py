@@ -0,0 +1,256 @@
+"""Compact, mergeable snapshots of the co-occurrence count table."""
+
+import heapq
+import struct
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from itertools import pairwise
+from typing import BinaryIO
+
+import pandas as pd
+
+from load_data import Encounter
+
+MAGIC = b"TECS"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sH")
+_LENGTH = struct.Struct("<I")
+_RECORD_COUNT = struct.Struct("<Q")
+_RECORD = struct.Struct("<IIIQ")
+
+Record = tuple[str, str, str, int]
+
+
+def _unique_sorted(tables: Iterable[list[str]]) -> list[str]:
+    """Merge sorted string tables into one sorted table without repeats."""
+    merged: list[str] = []
+    for value in heapq.merge(*tables):
+        if not merged or merged[-1] != value:
+            merged.append(value)
+    return merged
+
+
+def _write_strings(f: BinaryIO, values: list[str]) -> None:
+    """Write a length-prefixed table of UTF-8 strings."""
+    f.write(_LENGTH.pack(len(values)))
+    for value in values:
+        encoded = value.encode("utf-8")
+        f.write(_LENGTH.pack(len(encoded)))
+        f.write(encoded)
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    """Read exactly ``size`` bytes or raise on a truncated file."""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Snapshot file is truncated.")
+    return data
+
+
+def _read_strings(f: BinaryIO) -> list[str]:
+    """Read a table written by ``_write_strings``."""
+    (count,) = _LENGTH.unpack(_read_exact(f, _LENGTH.size))
+    values = []
+    for _ in range(count):
+        (length,) = _LENGTH.unpack(_read_exact(f, _LENGTH.size))
+        values.append(_read_exact(f, length).decode("utf-8"))
+    return values
+
+
+class CountSnapshot:
+    """Count table with dictionary-encoded ids and sorted keys.
+
+    ``months``, ``patientids`` and ``groupcodes`` are sorted string tables.
+    Row ``i`` holds indices into them and its count; rows are sorted by
+    ``(month, patientid, groupcode)``, so the tables and rows can be merged
+    with other snapshots in one linear pass.
+    """
+
+    def __init__(
+        self,
+        months: list[str],
+        patientids: list[str],
+        groupcodes: list[str],
+        records: Iterable[Record] = (),
+    ) -> None:
+        """Initialize from string tables and sorted records."""
+        self.months = months
+        self.patientids = patientids
+        self.groupcodes = groupcodes
+        self.month_idx = array("I")
+        self.patient_idx = array("I")
+        self.group_idx = array("I")
+        self.counts = array("Q")
+
+        month_code = {m: i for i, m in enumerate(months)}
+        patient_code = {p: i for i, p in enumerate(patientids)}
+        group_code = {g: i for i, g in enumerate(groupcodes)}
+        for month, pid, groupcode, count in records:
+            self.month_idx.append(month_code[month])
+            self.patient_idx.append(patient_code[pid])
+            self.group_idx.append(group_code[groupcode])
+            self.counts.append(count)
+        self._validate()
+
+    def _validate(self) -> None:
+        """Check that tables and rows are sorted, unique and in range."""
+        for name, table in (
+            ("months", self.months),
+            ("patientids", self.patientids),
+            ("groupcodes", self.groupcodes),
+        ):
+            if any(a >= b for a, b in pairwise(table)):
+                raise ValueError(
+                    f"Snapshot {name} table is not sorted and unique."
+                )
+
+        sizes = (len(self.months), len(self.patientids), len(self.groupcodes))
+        previous: tuple[int, int, int] | None = None
+        for key in zip(
+            self.month_idx, self.patient_idx, self.group_idx, strict=True
+        ):
+            if any(i >= n for i, n in zip(key, sizes, strict=True)):
+                raise ValueError(
+                    f"Snapshot row {key} refers past the string tables."
+                )
+            # Tables are sorted, so index order is string order.
+            if previous is not None and key <= previous:
+                raise ValueError(
+                    f"Snapshot rows are not sorted and unique at {key}."
+                )
+            previous = key
+
+    def __len__(self) -> int:
+        """Return the number of (month, patientid, groupcode) rows."""
+        return len(self.counts)
+
+    def records(self) -> Iterator[Record]:
+        """Yield ``(month, patientid, groupcode, count)`` in key order."""
+        for m, p, g, count in zip(
+            self.month_idx,
+            self.patient_idx,
+            self.group_idx,
+            self.counts,
+            strict=True,
+        ):
+            yield (
+                self.months[m],
+                self.patientids[p],
+                self.groupcodes[g],
+                count,
+            )
+
+    @classmethod
+    def _from_counter(
+        cls, counter: Counter[tuple[str, str, str]]
+    ) -> "CountSnapshot":
+        """Build a snapshot from counts keyed by (month, pid, groupcode)."""
+        keys = sorted(counter)
+        return cls(
+            sorted({m for m, _, _ in keys}),
+            sorted({p for _, p, _ in keys}),
+            sorted({g for _, _, g in keys}),
+            ((m, p, g, counter[(m, p, g)]) for m, p, g in keys),
+        )
+
+    @classmethod
+    def from_mapped(
+        cls, mapped_encounters: Iterable[tuple[Encounter, str]]
+    ) -> "CountSnapshot":
+        """Count mapped encounters without building a DataFrame."""
+        counter: Counter[tuple[str, str, str]] = Counter()
+        for enc, groupcode in mapped_encounters:
+            month = enc.encounterdate.strftime("%Y-%m")
+            counter[(month, enc.patientid, groupcode)] += 1
+        return cls._from_counter(counter)
+
+    @classmethod
+    def from_cooccurrence_table(cls, df: pd.DataFrame) -> "CountSnapshot":
+        """Build a snapshot from ``generate_cooccurrence_table`` output."""
+        counter: Counter[tuple[str, str, str]] = Counter()
+        for month, pid, groupcode, count in df[
+            ["month", "patientid", "groupcode", "count"]
+        ].itertuples(index=False):
+            counter[(str(month), str(pid), str(groupcode))] += int(count)
+        return cls._from_counter(counter)
+
+    def to_cooccurrence_table(self) -> pd.DataFrame:
+        """Return the counts in ``generate_cooccurrence_table`` layout."""
+        return pd.DataFrame(
+            list(self.records()),
+            columns=["month", "patientid", "groupcode", "count"],
+        ).astype({"count": "int64"})
+
+    def save(self, path: str) -> None:
+        """Write the snapshot to a binary file."""
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION))
+            _write_strings(f, self.months)
+            _write_strings(f, self.patientids)
+            _write_strings(f, self.groupcodes)
+            f.write(_RECORD_COUNT.pack(len(self)))
+            for row in zip(
+                self.month_idx,
+                self.patient_idx,
+                self.group_idx,
+                self.counts,
+                strict=True,
+            ):
+                f.write(_RECORD.pack(*row))
+
+    @classmethod
+    def load(cls, path: str) -> "CountSnapshot":
+        """Read a snapshot written by ``save``."""
+        with open(path, "rb") as f:
+            magic, version = _HEADER.unpack(_read_exact(f, _HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a count snapshot file.")
+            if version != VERSION:
+                raise ValueError(
+                    f"Unsupported snapshot version {version} "
+                    f"(expected {VERSION})."
+                )
+            snapshot = cls(
+                _read_strings(f), _read_strings(f), _read_strings(f)
+            )
+            (n,) = _RECORD_COUNT.unpack(_read_exact(f, _RECORD_COUNT.size))
+            body = _read_exact(f, n * _RECORD.size)
+
+        for m, p, g, count in _RECORD.iter_unpack(body):
+            snapshot.month_idx.append(m)
+            snapshot.patient_idx.append(p)
+            snapshot.group_idx.append(g)
+            snapshot.counts.append(count)
+        snapshot._validate()
+        return snapshot
+
+
+def merge(*snapshots: CountSnapshot) -> CountSnapshot:
+    """Sum several snapshots in one linear pass over their sorted rows.
+
+    Merging is associative and commutative, so partial results from sites or
+    yearly extracts can be combined in any grouping.
+    """
+
+    def summed() -> Iterator[Record]:
+        key: tuple[str, str, str] | None = None
+        total = 0
+        for month, pid, groupcode, count in heapq.merge(
+            *(s.records() for s in snapshots)
+        ):
+            if (month, pid, groupcode) != key:
+                if key is not None:
+                    yield (*key, total)
+                key, total = (month, pid, groupcode), 0
+            total += count
+        if key is not None:
+            yield (*key, total)
+
+    return CountSnapshot(
+        _unique_sorted(s.months for s in snapshots),
+        _unique_sorted(s.patientids for s in snapshots),
+        _unique_sorted(s.groupcodes for s in snapshots),
+        summed(),
+    )
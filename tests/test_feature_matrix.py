@@ -0,0 +1,92 @@
+"""Test build_feature_matrix() and FeatureMatrix save/load."""
+
+import os
+import tempfile
+from datetime import date
+
+import pytest
+
+from feature_matrix import FeatureMatrix, build_feature_matrix
+from load_data import Encounter
+from map_groupcode import MapTable
+
+ENCOUNTERS = [
+    Encounter("P002", "E001", date(2023, 6, 1), "L100"),
+    Encounter("P001", "E002", date(2023, 6, 2), "L200"),
+    Encounter("P001", "E003", date(2023, 7, 3), "L200"),
+    Encounter("P001", "E004", date(2023, 7, 4), "L999"),  # not in map
+]
+MAPTABLE = MapTable({"L100": "G1", "L200": "G2", "L300": "G3"})
+
+
+def test_build_feature_matrix_by_patient() -> None:
+    """Test rows per patient with columns from the mapping table."""
+    fm = build_feature_matrix(ENCOUNTERS, MAPTABLE)
+
+    assert fm.patientids == ["P001", "P002"]
+    assert fm.groupcodes == ["G1", "G2", "G3"]
+    assert fm.months is None
+    assert fm.matrix.toarray().tolist() == [[0, 2, 0], [1, 0, 0]]
+
+
+def test_build_feature_matrix_by_patient_month() -> None:
+    """Test rows per patient-month."""
+    fm = build_feature_matrix(ENCOUNTERS, MAPTABLE, by="patient_month")
+
+    assert fm.patientids == ["P001", "P001", "P002"]
+    assert fm.months == ["2023-06", "2023-07", "2023-06"]
+    assert fm.matrix.toarray().tolist() == [
+        [0, 1, 0],
+        [0, 1, 0],
+        [1, 0, 0],
+    ]
+
+
+def test_build_feature_matrix_fixed_columns() -> None:
+    """Test that a given column vocabulary is kept as-is."""
+    fm = build_feature_matrix(ENCOUNTERS, MAPTABLE, groupcodes=["G2"])
+
+    assert fm.patientids == ["P001"]
+    assert fm.matrix.toarray().tolist() == [[2]]
+
+
+def test_build_feature_matrix_invalid_by() -> None:
+    """Test that an unknown row granularity raises ValueError."""
+    with pytest.raises(ValueError, match="by must be"):
+        build_feature_matrix(ENCOUNTERS, MAPTABLE, by="month")
+
+
+def test_feature_matrix_npz_round_trip() -> None:
+    """Test that save_npz() and load_npz() preserve matrix and vocabs."""
+    fm = build_feature_matrix(ENCOUNTERS, MAPTABLE, by="patient_month")
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".npz") as tmp:
+        tmp_path = tmp.name
+
+    try:
+        fm.save_npz(tmp_path)
+        loaded = FeatureMatrix.load_npz(tmp_path)
+        assert loaded.patientids == fm.patientids
+        assert loaded.months == fm.months
+        assert loaded.groupcodes == fm.groupcodes
+        assert (loaded.matrix != fm.matrix).nnz == 0
+    finally:
+        os.remove(tmp_path)
+
+
+def test_build_feature_matrix_blank_groupcode() -> None:
+    """Test that blank groupcodes in the mapping CSV are skipped."""
+    mapping_csv = "localcode,groupcode\nL100,G1\nL200,\n"
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(mapping_csv)
+        tmp_path = tmp.name
+
+    try:
+        fm = build_feature_matrix(ENCOUNTERS, MapTable.from_csv(tmp_path))
+        assert fm.groupcodes == ["G1"]
+        assert fm.patientids == ["P002"]
+        assert fm.matrix.toarray().tolist() == [[1]]
+    finally:
+        os.remove(tmp_path)
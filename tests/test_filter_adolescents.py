@@ -5,7 +5,7 @@ from datetime import date
 import pytest
 
 from filter_adolescents import filter_adolescents
-from load_data import Encounter, Patient
+from load_data import Encounter, Patient, Quarantine
 
 
 def test_patientid_not_found_error() -> None:
@@ -28,3 +28,123 @@ def test_encounter_before_birth_error() -> None:
 
     with pytest.raises(ValueError, match="is before birthdate"):
         filter_adolescents(encounters, patients)
+
+
+PATIENTS = [
+    Patient("P001", date(2010, 5, 1)),
+    Patient("P002", date(2000, 1, 1)),
+    Patient("P003", date(2008, 12, 15)),
+]
+ENCOUNTERS = [
+    Encounter("P001", "E001", date(2023, 6, 1), "L100"),
+    Encounter("P001", "E002", date(2019, 6, 1), "L100"),  # age 9
+    Encounter("P002", "E003", date(2012, 6, 1), "L200"),
+    Encounter("P003", "E004", date(2022, 8, 10), "L300"),
+]
+
+
+def test_sort_merge_matches_hash_join() -> None:
+    """Test that both join strategies select the same encounters."""
+    merged = filter_adolescents(ENCOUNTERS, PATIENTS, presorted=True)
+    hashed = filter_adolescents(ENCOUNTERS, PATIENTS, presorted=False)
+
+    assert [e.encounterid for e in merged] == ["E001", "E003", "E004"]
+    assert list(merged) == list(hashed)
+
+
+def test_sort_merge_streams_iterators() -> None:
+    """Test that the sort-merge join accepts one-shot iterators."""
+    filtered = filter_adolescents(
+        iter(ENCOUNTERS), iter(PATIENTS), presorted=True
+    )
+    assert len(filtered) == 3
+
+
+def test_unsorted_lists_fall_back_to_hash_join() -> None:
+    """Test that unsorted inputs still filter correctly by default."""
+    filtered = filter_adolescents(ENCOUNTERS[::-1], PATIENTS[::-1])
+    assert [e.encounterid for e in filtered] == ["E004", "E003", "E001"]
+
+
+def test_sort_merge_patientid_not_found_error() -> None:
+    """Test that a skipped patientid raises during the sort-merge join."""
+    encounters = [
+        Encounter("P001", "E001", date(2023, 6, 1), "L100"),
+        Encounter("P0015", "E002", date(2023, 6, 1), "L100"),
+    ]
+
+    with pytest.raises(ValueError, match="patientid 'P0015' not found"):
+        filter_adolescents(encounters, PATIENTS, presorted=True)
+
+
+def test_sort_merge_encounter_before_birth_error() -> None:
+    """Test that encounters before birthdate raise during the merge."""
+    encounters = [Encounter("P003", "E001", date(2008, 1, 1), "L100")]
+
+    with pytest.raises(ValueError, match="is before birthdate"):
+        filter_adolescents(encounters, PATIENTS, presorted=True)
+
+
+def test_sort_merge_unsorted_input_error() -> None:
+    """Test that declaring unsorted input as sorted raises ValueError."""
+    with pytest.raises(ValueError, match="not sorted by patientid"):
+        filter_adolescents(ENCOUNTERS[::-1], PATIENTS, presorted=True)
+    with pytest.raises(ValueError, match="not sorted by patientid"):
+        filter_adolescents(
+            ENCOUNTERS[3:],
+            [PATIENTS[1], PATIENTS[0], PATIENTS[2]],
+            presorted=True,
+        )
+
+
+@pytest.mark.parametrize("presorted", [True, False])
+def test_filter_quarantines_invalid_encounters(presorted: bool) -> None:
+    """Test that lenient mode skips unknown patients and pre-birth dates."""
+    encounters = [
+        Encounter("P001", "E001", date(2023, 6, 1), "L100"),
+        Encounter("P001", "E002", date(2001, 1, 1), "L100"),  # before birth
+        Encounter("P0015", "E003", date(2023, 6, 1), "L100"),  # unknown
+        Encounter("P003", "E004", date(2022, 8, 10), "L300"),
+    ]
+    quarantine = Quarantine(None)
+
+    filtered = filter_adolescents(
+        encounters, PATIENTS, presorted=presorted, quarantine=quarantine
+    )
+
+    assert [e.encounterid for e in filtered] == ["E001", "E004"]
+    assert quarantine.reasons == {
+        "ENCOUNTER_BEFORE_DOB": 1,
+        "UNKNOWN_PATIENT": 1,
+    }
+
+
+@pytest.mark.parametrize("lenient", [False, True])
+def test_sort_merge_reports_unsorted_patients_after_lookup(
+    lenient: bool,
+) -> None:
+    """Test that out-of-order patients are reported, not as unknown."""
+    patients = [PATIENTS[0], PATIENTS[2], PATIENTS[1]]
+    encounters = [ENCOUNTERS[2], ENCOUNTERS[3]]
+
+    with pytest.raises(ValueError, match="Patients are not sorted"):
+        filter_adolescents(
+            encounters,
+            patients,
+            presorted=True,
+            quarantine=Quarantine(None) if lenient else None,
+        )
+
+
+@pytest.mark.parametrize("presorted", [True, False])
+def test_repeated_patientid_last_row_wins(presorted: bool) -> None:
+    """Test that both joins use the last dob of a repeated patientid."""
+    patients = [
+        Patient("P001", date(1990, 1, 1)),
+        Patient("P001", date(2010, 5, 1)),
+    ]
+    encounters = [Encounter("P001", "E001", date(2023, 6, 1), "L100")]
+
+    filtered = filter_adolescents(encounters, patients, presorted=presorted)
+
+    assert len(filtered) == 1
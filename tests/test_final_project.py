@@ -1,12 +1,23 @@
 """Test load_patients() and load_encounters()."""
 
+import csv
 import os
+import subprocess
+import sys
 import tempfile
 from datetime import date
 
 import pytest
 
-from load_data import Encounter, Patient, load_encounters, load_patients
+from load_data import (
+    Encounter,
+    EncounterDeduplicator,
+    Patient,
+    Quarantine,
+    iter_encounters,
+    load_encounters,
+    load_patients,
+)
 
 
 def test_load_patients_tempfile() -> None:
@@ -227,3 +238,263 @@ def test_load_encounters_invalid_date_format() -> None:
             load_encounters(tmp_path)
     finally:
         os.remove(tmp_path)
+
+
+def test_iter_encounters_streams_rows() -> None:
+    """Test that iter_encounters() yields the same rows lazily."""
+    csv_content = (
+        "patientid,encounterid,encounterdate,localcode\n"
+        "P001,E001,2023-06-01,L100\n"
+        "P002,E002,2022-08-10,L200\n"
+    )
+
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(csv_content)
+        tmp_path = tmp.name
+
+    try:
+        stream = iter_encounters(tmp_path)
+        assert next(stream) == Encounter(
+            "P001", "E001", date(2023, 6, 1), "L100"
+        )
+        assert list(stream) == [
+            Encounter("P002", "E002", date(2022, 8, 10), "L200")
+        ]
+    finally:
+        os.remove(tmp_path)
+
+
+DUPLICATED_ENCOUNTERS = (
+    "patientid,encounterid,encounterdate,localcode\n"
+    "P001,E001,2023-06-01,L100\n"
+    "P002,E002,2022-08-10,L200\n"
+    "P001,E001,2023-06-01,L100\n"
+    "P002,E002,2022-08-10,L300\n"
+)
+
+
+def test_load_encounters_dedup_by_encounterid() -> None:
+    """Test that repeated encounterids are dropped and counted."""
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(DUPLICATED_ENCOUNTERS)
+        tmp_path = tmp.name
+
+    try:
+        dedup = EncounterDeduplicator()
+        encounters = load_encounters(tmp_path, dedup=dedup)
+        assert [e.encounterid for e in encounters] == ["E001", "E002"]
+        assert dedup.removed == 2
+    finally:
+        os.remove(tmp_path)
+
+
+def test_load_encounters_dedup_by_row() -> None:
+    """Test that only whole identical rows are dropped in row mode."""
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(DUPLICATED_ENCOUNTERS)
+        tmp_path = tmp.name
+
+    try:
+        dedup = EncounterDeduplicator(key="row")
+        encounters = load_encounters(tmp_path, dedup=dedup)
+        assert [e.localcode for e in encounters] == ["L100", "L200", "L300"]
+        assert dedup.removed == 1
+    finally:
+        os.remove(tmp_path)
+
+
+def test_load_encounters_dedup_bloom_prefilter() -> None:
+    """Test that the Bloom prefilter gives the same result as exact mode."""
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(DUPLICATED_ENCOUNTERS)
+        tmp_path = tmp.name
+
+    try:
+        dedup = EncounterDeduplicator(expected_items=4, bloom_threshold=1)
+        encounters = load_encounters(tmp_path, dedup=dedup)
+        assert dedup.use_bloom
+        assert [e.encounterid for e in encounters] == ["E001", "E002"]
+        assert dedup.removed == 2
+    finally:
+        os.remove(tmp_path)
+
+
+def test_encounter_deduplicator_invalid_key() -> None:
+    """Test that an unknown dedup key raises ValueError."""
+    with pytest.raises(ValueError, match="Dedup key must be"):
+        EncounterDeduplicator(key="patientid")
+
+
+def test_load_encounters_quarantine_bad_rows() -> None:
+    """Test that lenient mode keeps good rows and quarantines bad ones."""
+    csv_content = (
+        "patientid,encounterid,encounterdate,localcode\n"
+        "P001,E001,2023-06-01,L100\n"
+        "P001,,2023-06-02,L100\n"
+        "P002,E003,2023/06/03,L200\n"
+        "P002,E004,2023-06-04,L200\n"
+    )
+
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(csv_content)
+        tmp_path = tmp.name
+    quarantine_path = tmp_path + ".rejected.csv"
+
+    try:
+        with Quarantine(quarantine_path) as quarantine:
+            encounters = load_encounters(tmp_path, quarantine=quarantine)
+
+        assert [e.encounterid for e in encounters] == ["E001", "E004"]
+        assert quarantine.count == 2
+        with open(quarantine_path, encoding="utf-8") as f:
+            rejected = list(csv.DictReader(f))
+        assert [r["reason"] for r in rejected] == [
+            "EMPTY_ENCOUNTERID",
+            "INVALID_ENCOUNTERDATE",
+        ]
+        assert [r["line"] for r in rejected] == ["3", "4"]
+        assert rejected[1]["record"] == "P002,E003,2023/06/03,L200"
+    finally:
+        os.remove(tmp_path)
+        os.remove(quarantine_path)
+
+
+def test_load_patients_quarantine_error_budget() -> None:
+    """Test that exceeding max_errors aborts the load."""
+    csv_content = "patientid,dob\n,2010-05-01\nP002,bad\nP003,2008-01-01\n"
+
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(csv_content)
+        tmp_path = tmp.name
+
+    try:
+        assert load_patients(tmp_path, quarantine=Quarantine(None, 2)) == [
+            Patient("P003", date(2008, 1, 1))
+        ]
+        with pytest.raises(ValueError, match="Error budget exceeded"):
+            load_patients(tmp_path, quarantine=Quarantine(None, 1))
+    finally:
+        os.remove(tmp_path)
+
+
+@pytest.mark.parametrize("expected_items", [None, 4], ids=["exact", "bloom"])
+def test_load_encounters_dedup_across_files(
+    expected_items: int | None,
+) -> None:
+    """Test that one deduplicator drops repeats between two files."""
+    header = "patientid,encounterid,encounterdate,localcode\n"
+    contents = [
+        header + "P001,E1,2023-06-01,L100\nP001,E2,2023-06-02,L100\n",
+        header + "P001,E2,2023-06-02,L100\nP002,E3,2023-06-03,L200\n",
+    ]
+    paths = []
+    for content in contents:
+        with tempfile.NamedTemporaryFile(
+            mode="w", delete=False, suffix=".csv"
+        ) as tmp:
+            tmp.write(content)
+            paths.append(tmp.name)
+
+    try:
+        dedup = EncounterDeduplicator(
+            expected_items=expected_items, bloom_threshold=1
+        )
+        assert dedup.use_bloom == (expected_items is not None)
+        encounters = [
+            e for path in paths for e in load_encounters(path, dedup=dedup)
+        ]
+        assert [e.encounterid for e in encounters] == ["E1", "E2", "E3"]
+        assert dedup.removed == 1
+    finally:
+        for path in paths:
+            os.remove(path)
+
+
+def test_encounter_deduplicator_bloom_requires_prescan() -> None:
+    """Test that Bloom mode refuses to filter a file it did not prescan."""
+    dedup = EncounterDeduplicator(expected_items=4, bloom_threshold=1)
+    encounter = Encounter("P001", "E001", date(2023, 6, 1), "L100")
+
+    with pytest.raises(ValueError, match="prescan"):
+        dedup.filter([encounter])
+
+
+def test_load_encounters_dedup_earlier_file_changed() -> None:
+    """Test that Bloom mode raises if an earlier file changed on disk."""
+    header = "patientid,encounterid,encounterdate,localcode\n"
+    paths = []
+    for _ in range(2):
+        with tempfile.NamedTemporaryFile(
+            mode="w", delete=False, suffix=".csv"
+        ) as tmp:
+            tmp.write(header + "P001,E1,2023-06-01,L100\n")
+            paths.append(tmp.name)
+
+    try:
+        dedup = EncounterDeduplicator(expected_items=4, bloom_threshold=1)
+        load_encounters(paths[0], dedup=dedup)
+        with open(paths[0], "a", encoding="utf-8") as f:
+            f.write("P002,E2,2023-06-02,L200\n")
+        with pytest.raises(ValueError, match="has changed"):
+            load_encounters(paths[1], dedup=dedup)
+    finally:
+        for path in paths:
+            os.remove(path)
+
+
+def test_quarantine_record_round_trips_fields() -> None:
+    """Test that quoted and overflow fields survive in the record."""
+    csv_content = (
+        "patientid,encounterid,encounterdate,localcode\n"
+        'P001,E001,2023/06/01,"L1,""00"""\n'
+        "P002,,2023-06-02,L200,extra\n"
+    )
+
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(csv_content)
+        tmp_path = tmp.name
+    quarantine_path = tmp_path + ".rejected.csv"
+
+    try:
+        with Quarantine(quarantine_path) as quarantine:
+            load_encounters(tmp_path, quarantine=quarantine)
+
+        with open(quarantine_path, encoding="utf-8") as f:
+            records = [r["record"] for r in csv.DictReader(f)]
+        assert [next(csv.reader([r])) for r in records] == [
+            ["P001", "E001", "2023/06/01", 'L1,"00"'],
+            ["P002", "", "2023-06-02", "L200", "extra"],
+        ]
+    finally:
+        os.remove(tmp_path)
+        os.remove(quarantine_path)
+
+
+def test_src_imports_from_repo_root() -> None:
+    """Test that src-style imports and main.py work from the repo root."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+
+    for args in (["-c", "import src.filter_adolescents"], ["main.py"]):
+        result = subprocess.run(
+            [sys.executable, *args],
+            cwd=root,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, result.stderr
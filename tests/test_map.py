@@ -10,6 +10,7 @@ import pytest
 from load_data import Encounter
 from map_groupcode import (
     MapTable,
+    diff_cooccurrence_tables,
     generate_cooccurrence_table,
 )
 
@@ -172,3 +173,105 @@ def test_generate_cooccurrence_table_multiple_groupcodes_same_patient() -> (
 
     assert row_g2.iloc[0]["count"] == 1
     assert row_g2.iloc[0]["month"] == "2023-06"
+
+
+def test_cooccurrence_by_version_matches_single_runs() -> None:
+    """Test that one pass gives the same table as per-version runs."""
+    v1 = {"L100": "G1", "L200": "G2"}
+    v2 = {"L100": "G1", "L200": "G3", "L300": "G3"}
+    encounters = [
+        Encounter("P001", "E001", date(2023, 6, 1), "L100"),
+        Encounter("P001", "E002", date(2023, 6, 2), "L200"),
+        Encounter("P002", "E003", date(2023, 7, 3), "L300"),
+        Encounter("P002", "E004", date(2023, 7, 4), "L999"),
+    ]
+
+    mapper = MapTable(v1, versions={"v1": v1, "v2": v2})
+    tables = mapper.cooccurrence_by_version(encounters)
+
+    assert list(tables) == ["v1", "v2"]
+    for name, mapping in mapper.versions.items():
+        expected = generate_cooccurrence_table(
+            MapTable(mapping).map_encounters(encounters)
+        )
+        assert tables[name].equals(expected)
+
+
+def test_cooccurrence_by_version_requires_versions() -> None:
+    """Test that a MapTable without versions raises ValueError."""
+    with pytest.raises(ValueError, match="no mapping versions"):
+        MapTable({"L100": "G1"}).cooccurrence_by_version([])
+
+
+def test_from_csv_versions_and_diff() -> None:
+    """Test loading versions from CSV and diffing their counts."""
+    paths = {}
+    for name, content in [
+        ("old", "localcode,groupcode\nL100,G1\nL200,G2\n"),
+        ("new", "localcode,groupcode\nL100,G1\nL200,G1\n"),
+    ]:
+        with tempfile.NamedTemporaryFile(
+            mode="w", delete=False, suffix=".csv"
+        ) as tmp:
+            tmp.write(content)
+            paths[name] = tmp.name
+
+    try:
+        mapper = MapTable.from_csv_versions(paths)
+        assert mapper.mapping == {"L100": "G1", "L200": "G2"}
+
+        encounters = [
+            Encounter("P001", "E001", date(2023, 6, 1), "L100"),
+            Encounter("P001", "E002", date(2023, 6, 2), "L200"),
+            Encounter("P002", "E003", date(2023, 6, 3), "L100"),
+        ]
+        diff = diff_cooccurrence_tables(
+            mapper.cooccurrence_by_version(encounters)
+        )
+
+        assert list(diff.columns) == [
+            "month",
+            "patientid",
+            "groupcode",
+            "old",
+            "new",
+        ]
+        assert diff.values.tolist() == [
+            ["2023-06", "P001", "G1", 1, 2],
+            ["2023-06", "P001", "G2", 1, 0],
+        ]
+    finally:
+        for path in paths.values():
+            os.remove(path)
+
+
+def test_cooccurrence_by_version_blank_groupcode() -> None:
+    """Test that a blank groupcode matches the per-version table."""
+    mapping_csv = "localcode,groupcode\nL100,G1\nL200,\n"
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, suffix=".csv"
+    ) as tmp:
+        tmp.write(mapping_csv)
+        tmp_path = tmp.name
+
+    try:
+        mapper = MapTable.from_csv_versions({"v1": tmp_path})
+        encounters = [
+            Encounter("P001", "E001", date(2023, 6, 1), "L100"),
+            Encounter("P001", "E002", date(2023, 6, 2), "L200"),
+        ]
+
+        tables = mapper.cooccurrence_by_version(encounters)
+
+        expected = generate_cooccurrence_table(
+            mapper.map_encounters(encounters)
+        )
+        assert tables["v1"].equals(expected)
+    finally:
+        os.remove(tmp_path)
+
+
+def test_diff_cooccurrence_tables_requires_tables() -> None:
+    """Test that diffing no tables raises ValueError."""
+    with pytest.raises(ValueError, match="At least one co-occurrence table"):
+        diff_cooccurrence_tables({})
@@ -0,0 +1,123 @@
+"""Test sketches and generate_cooccurrence_sketch()."""
+
+from datetime import date
+
+import pytest
+
+from load_data import Encounter
+from map_groupcode import generate_cooccurrence_sketch
+from sketches import BloomFilter, CountMinSketch, HeavyHitters, HyperLogLog
+
+
+def test_hyperloglog_estimate_close() -> None:
+    """Test that the distinct estimate is within a few percent."""
+    hll = HyperLogLog(precision=12)
+    for i in range(10000):
+        hll.add(f"P{i}")
+        hll.add(f"P{i}")  # duplicates do not count
+
+    assert abs(hll.count() - 10000) < 500
+
+
+def test_hyperloglog_merge_matches_union() -> None:
+    """Test that merging shard sketches equals sketching the union."""
+    shard_a, shard_b, full = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        (shard_a if i % 2 else shard_b).add(f"P{i}")
+        full.add(f"P{i}")
+
+    assert shard_a.merge(shard_b).registers == full.registers
+
+
+def test_hyperloglog_merge_precision_mismatch() -> None:
+    """Test that merging sketches of different precision raises."""
+    with pytest.raises(ValueError, match="different precision"):
+        HyperLogLog(10).merge(HyperLogLog(12))
+
+
+def test_count_min_never_underestimates() -> None:
+    """Test that Count-Min estimates are upper bounds."""
+    cms = CountMinSketch(width=64, depth=4)
+    for i in range(500):
+        cms.add(f"G{i % 50}")
+
+    assert all(cms.estimate(f"G{i}") >= 10 for i in range(50))
+
+
+def test_heavy_hitters_top_and_merge() -> None:
+    """Test that heavy hitters survive a merge of two shards."""
+    shard_a, shard_b = HeavyHitters(k=2), HeavyHitters(k=2)
+    for _ in range(30):
+        shard_a.add("G1")
+    for _ in range(20):
+        shard_b.add("G2")
+    for i in range(10):
+        shard_a.add(f"rare{i}")
+        shard_b.add(f"rare{i}")
+
+    merged = shard_a.merge(shard_b)
+
+    assert [key for key, _ in merged.top()] == ["G1", "G2"]
+
+
+def test_generate_cooccurrence_sketch() -> None:
+    """Test distinct patients and counts per (month, groupcode)."""
+    mapped = [
+        (Encounter("P001", "E001", date(2023, 6, 1), "L100"), "G1"),
+        (Encounter("P001", "E002", date(2023, 6, 9), "L100"), "G1"),
+        (Encounter("P002", "E003", date(2023, 6, 9), "L100"), "G1"),
+        (Encounter("P002", "E004", date(2023, 7, 1), "L200"), "G2"),
+    ]
+
+    sketch = generate_cooccurrence_sketch(mapped)
+
+    assert sketch.distinct_patients("2023-06", "G1") == 2
+    assert sketch.estimate_count("2023-06", "G1") == 3
+    assert sketch.estimate_count("2023-08", "G1") == 0
+    assert sketch.top_groupcodes(1) == [("2023-06", "G1", 3)]
+
+    frame = sketch.to_frame()
+    assert list(frame.columns) == [
+        "month",
+        "groupcode",
+        "distinct_patients",
+        "count",
+    ]
+    assert frame.shape[0] == 2
+
+
+def test_generate_cooccurrence_sketch_merge_shards() -> None:
+    """Test that shard sketches merge without sharing state."""
+    enc_a = Encounter("P001", "E001", date(2023, 6, 1), "L100")
+    enc_b = Encounter("P002", "E002", date(2023, 6, 2), "L100")
+    shard_a = generate_cooccurrence_sketch([(enc_a, "G1")])
+    shard_b = generate_cooccurrence_sketch([(enc_b, "G1")])
+
+    merged = shard_a.merge(shard_b)
+
+    assert merged.distinct_patients("2023-06", "G1") == 2
+    assert merged.estimate_count("2023-06", "G1") == 2
+    assert shard_a.distinct_patients("2023-06", "G1") == 1
+
+
+def test_bloom_filter_no_false_negatives() -> None:
+    """Test that every added value is reported as present."""
+    bloom = BloomFilter(capacity=1000, false_positive_rate=0.01)
+    assert not bloom.add("E0")
+    assert bloom.add("E0")
+    for i in range(1, 1000):
+        bloom.add(f"E{i}")
+
+    assert all(f"E{i}" in bloom for i in range(1000))
+    false_positives = sum(f"X{i}" in bloom for i in range(1000))
+    assert false_positives < 50
+
+
+def test_generate_cooccurrence_sketch_merge_parameter_mismatch() -> None:
+    """Test that sketches with different parameters refuse to merge."""
+    enc = Encounter("P001", "E001", date(2023, 6, 1), "L100")
+    shard_a = generate_cooccurrence_sketch([(enc, "G1")], top_k=5)
+    shard_b = generate_cooccurrence_sketch([(enc, "G1")], top_k=10)
+
+    with pytest.raises(ValueError, match="different parameters"):
+        shard_a.merge(shard_b)
@@ -0,0 +1,125 @@
+"""Test CountSnapshot save/load and merge()."""
+
+import os
+import tempfile
+from datetime import date
+
+import pytest
+
+from load_data import Encounter
+from map_groupcode import generate_cooccurrence_table
+from snapshot import CountSnapshot, merge
+
+SITE_A = [
+    (Encounter("P001", "E001", date(2023, 6, 1), "L100"), "G1"),
+    (Encounter("P001", "E002", date(2023, 6, 9), "L100"), "G1"),
+    (Encounter("P002", "E003", date(2023, 7, 1), "L200"), "G2"),
+]
+SITE_B = [
+    (Encounter("P001", "E101", date(2023, 6, 2), "L100"), "G1"),
+    (Encounter("P003", "E102", date(2023, 6, 3), "L300"), "G3"),
+]
+
+
+def test_snapshot_matches_cooccurrence_table() -> None:
+    """Test that a snapshot holds the same counts as the DataFrame."""
+    snapshot = CountSnapshot.from_mapped(SITE_A)
+    expected = generate_cooccurrence_table(SITE_A)
+
+    assert snapshot.months == ["2023-06", "2023-07"]
+    assert snapshot.to_cooccurrence_table().equals(expected)
+    from_df = CountSnapshot.from_cooccurrence_table(expected)
+    assert list(from_df.records()) == list(snapshot.records())
+
+
+def test_snapshot_save_load_round_trip() -> None:
+    """Test that save() and load() preserve every row."""
+    snapshot = CountSnapshot.from_mapped(SITE_A)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".snap") as tmp:
+        tmp_path = tmp.name
+
+    try:
+        snapshot.save(tmp_path)
+        loaded = CountSnapshot.load(tmp_path)
+        assert list(loaded.records()) == list(snapshot.records())
+    finally:
+        os.remove(tmp_path)
+
+
+def test_snapshot_load_rejects_other_files() -> None:
+    """Test that a file without the snapshot header raises ValueError."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".snap") as tmp:
+        tmp.write(b"patientid,dob\n")
+        tmp_path = tmp.name
+
+    try:
+        with pytest.raises(ValueError, match="not a count snapshot"):
+            CountSnapshot.load(tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+
+def test_merge_sums_counts() -> None:
+    """Test that merging equals counting the combined encounters."""
+    merged = merge(
+        CountSnapshot.from_mapped(SITE_A), CountSnapshot.from_mapped(SITE_B)
+    )
+    expected = CountSnapshot.from_mapped(SITE_A + SITE_B)
+
+    assert merged.patientids == ["P001", "P002", "P003"]
+    assert list(merged.records()) == list(expected.records())
+    assert ("2023-06", "P001", "G1", 3) in merged.records()
+
+
+def test_merge_is_associative() -> None:
+    """Test that grouping of merges does not change the result."""
+    a = CountSnapshot.from_mapped(SITE_A[:1])
+    b = CountSnapshot.from_mapped(SITE_A[1:])
+    c = CountSnapshot.from_mapped(SITE_B)
+
+    left = merge(merge(a, b), c)
+    right = merge(a, merge(b, c))
+
+    assert list(left.records()) == list(right.records())
+    assert list(merge(a, b, c).records()) == list(left.records())
+
+
+def test_snapshot_rejects_unsorted_records() -> None:
+    """Test that out-of-order or repeated rows raise ValueError."""
+    with pytest.raises(ValueError, match="not sorted and unique"):
+        CountSnapshot(
+            ["2023-06"],
+            ["P001", "P002"],
+            ["G1"],
+            [("2023-06", "P002", "G1", 1), ("2023-06", "P001", "G1", 1)],
+        )
+    with pytest.raises(ValueError, match="not sorted and unique"):
+        CountSnapshot(["2023-07", "2023-06"], ["P001"], ["G1"])
+
+
+def test_snapshot_load_rejects_bad_indices() -> None:
+    """Test that a row pointing past the string tables fails on load."""
+    snapshot = CountSnapshot.from_mapped(SITE_A)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".snap") as tmp:
+        tmp_path = tmp.name
+
+    try:
+        snapshot.group_idx[0] = 99
+        snapshot.save(tmp_path)
+        with pytest.raises(ValueError, match="refers past the string"):
+            CountSnapshot.load(tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+
+def test_empty_snapshot_table_dtype() -> None:
+    """Test that an empty snapshot matches the empty DataFrame layout."""
+    table = CountSnapshot.from_mapped([]).to_cooccurrence_table()
+
+    assert table.empty
+    assert (
+        table.dtypes["count"]
+        == generate_cooccurrence_table([]).dtypes["count"]
+    )